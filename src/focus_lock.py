@@ -1,10 +1,10 @@
 # focus_lock.py
 from __future__ import annotations
 
-from typing import List, Optional, cast
+from typing import Dict, Optional, cast
 
 from PySide6.QtCore import Qt, QTimer, QObject
-from PySide6.QtGui import QGuiApplication
+from PySide6.QtGui import QGuiApplication, QPainter, QScreen
 from PySide6.QtWidgets import QWidget
 
 
@@ -18,10 +18,19 @@ class BlackOverlay(QWidget):
         self.setWindowFlag(Qt.WindowType.Tool, True)
         self.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating, True)
         self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
-        self.setStyleSheet("background: black;")
+        # selbst schwarz füllen statt QSS: Qt muss keinen Hintergrund löschen
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent, True)
+        self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground, True)
+
+    def paintEvent(self, e):
+        QPainter(self).fillRect(e.rect(), Qt.GlobalColor.black)
 
     def show_on_screen(self):
-        geo = self._screen.geometry()
+        # ohne Screen: ein Fenster über den gesamten virtuellen Desktop
+        if self._screen is None:
+            geo = QGuiApplication.primaryScreen().virtualGeometry()
+        else:
+            geo = self._screen.geometry()
         self.setGeometry(geo)
         self.show()
         self.raise_()
@@ -34,17 +43,26 @@ class FocusLockManager(QObject):
         self.enabled = enabled
         self.reactivate_ms = int(reactivate_minutes * 60 * 1000)
 
-        self._overlays: List[BlackOverlay] = []
+        # Normalfall: ein einziges Overlay über den virtuellen Desktop.
+        # Fallback bei gemischter DPI: ein Overlay pro Bildschirm.
+        # Beide werden über Lock-Zyklen hinweg wiederverwendet.
+        self._desktop_overlay: Optional[BlackOverlay] = None
+        self._overlays: Dict[QScreen, BlackOverlay] = {}
         self._lock_active = False
 
-        self._reactivate_timer = QTimer(self)
-        self._reactivate_timer.setSingleShot(True)
-        self._reactivate_timer.timeout.connect(self._on_reactivate_timeout)
+        # kein eigenes QTimer-Objekt: jede Planung ist ein QTimer.singleShot mit
+        # Epoch-Token; Abbrechen = Epoch hochzählen (veraltete Shots verpuffen)
+        self._reactivate_epoch = 0
+
+        self._last_state = Qt.ApplicationState.ApplicationActive
 
         app = QGuiApplication.instance()
         if app is not None:
             gui_app = cast(QGuiApplication, app)
+            self._last_state = gui_app.applicationState()
             gui_app.applicationStateChanged.connect(self._on_app_state_changed)
+            gui_app.screenAdded.connect(self._on_screen_added)
+            gui_app.screenRemoved.connect(self._on_screen_removed)
 
     def set_enabled(self, enabled: bool):
         self.enabled = enabled
@@ -55,37 +73,47 @@ class FocusLockManager(QObject):
         if not self.enabled or self._lock_active:
             return
         self._lock_active = True
-        self._reactivate_timer.stop()
+        self.cancel_reactivate()
 
-        self._destroy_overlays()
-        for screen in QGuiApplication.screens():
-            ov = BlackOverlay(screen)
-            ov.show_on_screen()
-            self._overlays.append(ov)
+        self._show_overlays()
 
-        self.main_window.setWindowFlag(Qt.WindowType.WindowStaysOnTopHint, True)
-        self.main_window.show()
+        self._set_stays_on_top(True)
         self.main_window.raise_()
         self.main_window.activateWindow()
 
     def disable_lock(self):
+        self.cancel_reactivate()
         if not self._lock_active:
-            self._reactivate_timer.stop()
             return
         self._lock_active = False
-        self._reactivate_timer.stop()
-        self._destroy_overlays()
+        self._hide_overlays()
 
-        self.main_window.setWindowFlag(Qt.WindowType.WindowStaysOnTopHint, False)
+        self._set_stays_on_top(False)
+
+    def _set_stays_on_top(self, on: bool):
+        # Flag direkt am QWindow setzen: QWidget.setWindowFlag auf einem sichtbaren
+        # Fenster erzeugt das native Fenster neu (und braucht danach show())
+        wh = self.main_window.windowHandle()
+        if wh is not None:
+            wh.setFlag(Qt.WindowType.WindowStaysOnTopHint, on)
+            return
+        self.main_window.setWindowFlag(Qt.WindowType.WindowStaysOnTopHint, on)
         self.main_window.show()
 
     def schedule_reactivate_if_inactive(self):
         if not self.enabled:
             return
-        self._reactivate_timer.start(self.reactivate_ms)
+        self._reactivate_epoch += 1
+        token = self._reactivate_epoch
+        QTimer.singleShot(self.reactivate_ms, lambda t=token: self._fire_reactivate(t))
 
     def cancel_reactivate(self):
-        self._reactivate_timer.stop()
+        self._reactivate_epoch += 1
+
+    def _fire_reactivate(self, token: int):
+        if token != self._reactivate_epoch:
+            return
+        self._on_reactivate_timeout()
 
     def _on_reactivate_timeout(self):
         app = QGuiApplication.instance()
@@ -97,14 +125,56 @@ class FocusLockManager(QObject):
             self.enable_lock()
 
     def _on_app_state_changed(self, state: Qt.ApplicationState):
+        # manche Plattformen feuern das Signal bei jedem Fokuswechsel mehrfach
+        if state == self._last_state:
+            return
+        self._last_state = state
         if state == Qt.ApplicationState.ApplicationActive:
             self.cancel_reactivate()
 
-    def _destroy_overlays(self):
-        for ov in self._overlays:
+    def _show_overlays(self):
+        screens = QGuiApplication.screens()
+        if not screens:
+            return
+
+        # virtualGeometry() ist nur verlässlich, wenn alle Bildschirme dieselbe
+        # devicePixelRatio haben (sonst mischen sich px- und dip-Koordinaten)
+        if len({s.devicePixelRatio() for s in screens}) == 1:
+            for ov in self._overlays.values():
+                ov.hide()
+            if self._desktop_overlay is None:
+                self._desktop_overlay = BlackOverlay(None)
+            self._desktop_overlay.show_on_screen()
+        else:
+            if self._desktop_overlay is not None:
+                self._desktop_overlay.hide()
+            for screen in screens:
+                self._overlay_for(screen).show_on_screen()
+
+    def _on_screen_added(self, screen: QScreen):
+        if self._lock_active:
+            self._show_overlays()
+
+    def _on_screen_removed(self, screen: QScreen):
+        ov = self._overlays.pop(screen, None)
+        if ov is not None:
+            ov.hide()
+            ov.deleteLater()
+        if self._lock_active:
+            self._show_overlays()
+
+    def _overlay_for(self, screen: QScreen) -> BlackOverlay:
+        ov = self._overlays.get(screen)
+        if ov is None:
+            ov = BlackOverlay(screen)
+            self._overlays[screen] = ov
+        return ov
+
+    def _hide_overlays(self):
+        if self._desktop_overlay is not None:
+            self._desktop_overlay.hide()
+        for ov in self._overlays.values():
             try:
                 ov.hide()
-                ov.deleteLater()
             except Exception:
                 pass
-        self._overlays = []
@@ -12,14 +12,17 @@ import json
 import os
 import re
 import random
-from dataclasses import dataclass
+from contextlib import contextmanager
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import date
 import math
 
-from PySide6.QtCore import (Qt, QEvent)
-from PySide6.QtGui import QFont
+from PySide6.QtCore import (Qt, QEvent, QObject, QRunnable, QThreadPool, QTimer, Signal)
+from PySide6.QtGui import QColor, QFont, QPalette
 from PySide6.QtWidgets import (
     QApplication,
     QCheckBox,
@@ -42,11 +45,34 @@ from PySide6.QtWidgets import (
 
 from focus_lock import FocusLockManager
 
+try:
+    import ahocorasick  # optional: pip install pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import ijson  # optional: pip install ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson  # optional: pip install orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
 
 APP_NAME = "Lumio"
 DECKS_DIR = "decks"
 PROGRESS_FILE = "progress.json"
+DECK_TITLES_FILE = "deck_titles.json"
 DATA_DIR = "data"
+# ab dieser Dateigröße Decks mit ijson streamen statt komplett zu parsen
+STREAM_MIN_BYTES = 8 * 1024 * 1024
 
 # ----------------------------
 # Data Model
@@ -61,6 +87,20 @@ class TextQuestion:
     min_words: int = 20
     max_repeats: int = 999999
     example: str = ""
+    # Original-Schreibweise der ersten Phrase je Gruppe (nur für die Anzeige)
+    rubric_labels: List[str] = field(default_factory=list)
+    # Phrasen wie im Deck geschrieben (parallel zu rubric, für "matched" in der Anzeige)
+    rubric_display: List[List[str]] = field(default_factory=list)
+    # vom Hauptfenster gesetzt: Deck-Key und globale ID "dk::id"
+    dk: str = ""
+    gqid: str = ""
+    # zur Ladezeit gebaut (siehe compile_rubric)
+    _rubric_keys: List[List[str]] = field(default_factory=list, init=False, repr=False, compare=False)
+    _ac: Any = field(default=None, init=False, repr=False, compare=False)
+    _compiled: List[Optional[re.Pattern]] = field(default_factory=list, init=False, repr=False, compare=False)
+    _scan: Any = field(default=None, init=False, repr=False, compare=False)
+    # Feedback-Zeilen je Gruppe: (Präfix für Treffer, fertige Zeile für Fehlt)
+    _feedback: List[Tuple[str, str]] = field(default_factory=list, init=False, repr=False, compare=False)
 
 @dataclass
 class DeckMeta:
@@ -71,24 +111,19 @@ class DeckMeta:
 # Text Scoring
 # ----------------------------
 
-def normalize(text: str) -> str:
-    t = text.strip().lower()
-    t = (
-        t.replace("ä", "ae")
-         .replace("ö", "oe")
-         .replace("ü", "ue")
-         .replace("ß", "ss")
-    )
-
-    # WICHTIG: Bindestriche/Striche als Worttrenner behandeln
-    # sigma-algebra -> sigma algebra
-    t = re.sub(r"[\u2010\u2011\u2012\u2013\u2014\u2212\-]+", " ", t)  # diverse dash chars + '-'
+_UMLAUT_TABLE = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
 
-    # Sonstige Satzzeichen raus (wir lassen ein paar Operatoren stehen, falls du sie brauchst)
-    t = re.sub(r"[^\w\s=*+/<>()]", " ", t, flags=re.UNICODE)
+# Sonstige Satzzeichen raus (wir lassen ein paar Operatoren stehen, falls du sie brauchst).
+# WICHTIG: Bindestriche/Striche (auch \u2010-\u2014, \u2212) fallen hier mit raus und
+# werden so zu Worttrennern: sigma-algebra -> sigma algebra
+_NON_WORD_RE = re.compile(r"[^\w\s=*+/<>()]+")
+_WS_RE = re.compile(r"\s+")
 
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
+@lru_cache(maxsize=1024)
+def normalize(text: str) -> str:
+    t = text.lower().translate(_UMLAUT_TABLE)
+    t = _NON_WORD_RE.sub(" ", t)
+    return _WS_RE.sub(" ", t).strip()
 
 def _tokenize(norm_text: str) -> List[str]:
     return [] if not norm_text else norm_text.split()
@@ -110,59 +145,102 @@ def _stem_de(token: str) -> str:
 
     return w
 
-def _contains_phrase_stemmed(norm_text: str, phrase: str) -> bool:
+def _stem_key(norm_text: str) -> str:
     """
-    Prüft, ob 'phrase' in 'norm_text' vorkommt, aber auf Token-Stämmen.
-    Unterstützt Mehrwort-Phrasen.
+    Token-Stämme mit Leerzeichen gepolstert: " axiom menge ".
+    Ein Substring-Treffer zwischen zwei Keys entspricht damit genau
+    einem zusammenhängenden Match auf Token-Stämmen (auch Mehrwort-Phrasen).
     """
-    nt = normalize(norm_text)  # norm_text ist bei dir i.d.R. schon normalized, aber sicher ist sicher
-    pt = normalize(phrase)
+    stems = [_stem_de(x) for x in _tokenize(norm_text)]
+    return " " + " ".join(stems) + " " if stems else ""
 
-    text_tokens = [_stem_de(x) for x in _tokenize(nt)]
-    phrase_tokens = [_stem_de(x) for x in _tokenize(pt)]
-
-    if not phrase_tokens:
-        return False
-
-    # 1-token Phrase: direkt in Tokenliste suchen
-    if len(phrase_tokens) == 1:
-        p = phrase_tokens[0]
-        return any(tok == p for tok in text_tokens)
-
-    # Mehrwort: contiguous sequence match
-    m = len(phrase_tokens)
-    for i in range(0, len(text_tokens) - m + 1):
-        if text_tokens[i:i+m] == phrase_tokens:
-            return True
+def compile_rubric(q: TextQuestion) -> None:
+    """
+    Einmalig beim Laden: (bereits normalisierte) Phrasen stemmen und (falls
+    pyahocorasick installiert ist) einen Automaten über alle Gruppen bauen,
+    damit der Text pro Check nur einmal linear gescannt wird.
+    Ohne pyahocorasick: eine kompilierte Alternation pro Gruppe.
+    """
+    q._rubric_keys = [[_stem_key(p) for p in group] for group in q.rubric]
+    # Scan-Ergebnis je normalisiertem Text merken (erneuter Check, nur Leerzeichen
+    # geändert, ...); hängt an der Frage und verschwindet mit ihr beim Neuladen
+    q._scan = lru_cache(maxsize=32)(partial(rubric_hits_details, q))
+
+    if ahocorasick is None:
+        q._ac = None
+        q._compiled = [
+            re.compile("|".join(re.escape(k) for k in keys if k)) if any(keys) else None
+            for keys in q._rubric_keys
+        ]
+        return
 
-    return False
+    automaton = ahocorasick.Automaton()
+    for gi, keys in enumerate(q._rubric_keys):
+        for pi, key in enumerate(keys):
+            if not key:
+                continue
+            # gleiche Phrase in mehreren Gruppen: alle Gruppen merken
+            entries = automaton.get(key, [])
+            entries.append((gi, pi))
+            automaton.add_word(key, entries)
+    if len(automaton) == 0:
+        q._ac = None
+        return
+    automaton.make_automaton()
+    q._ac = automaton
 
-def rubric_hits_details(rubric: List[List[str]], norm_text: str) -> Tuple[int, List[bool], List[Optional[str]]]:
-    hits: List[bool] = []
-    matched: List[Optional[str]] = []
+def rubric_hits_details(q: TextQuestion, norm_text: str) -> Tuple[int, List[bool], List[Optional[str]]]:
+    n = len(q.rubric)
+    hits: List[bool] = [False] * n
+    matched: List[Optional[str]] = [None] * n
 
     # norm_text kommt bei dir aus normalize(user_text)
-    for group in rubric:
-        found = None
-        for phrase in group:
-            # Stemmed Phrase Match statt "phrase in text"
-            if _contains_phrase_stemmed(norm_text, phrase):
-                found = phrase
+    text_key = _stem_key(norm_text)
+
+    if q._ac is not None:
+        # pro Gruppe gewinnt (wie bisher) die erste Phrase in Rubrik-Reihenfolge
+        best: List[Optional[int]] = [None] * n
+        firsts = 0
+        for _end, entries in q._ac.iter(text_key):
+            for gi, pi in entries:
+                cur = best[gi]
+                if cur is None or pi < cur:
+                    best[gi] = pi
+                    if pi == 0:
+                        firsts += 1
+            if firsts == n:
                 break
-        ok = found is not None
-        hits.append(ok)
-        matched.append(found)
+        for gi, pi in enumerate(best):
+            if pi is not None:
+                hits[gi] = True
+                matched[gi] = q.rubric_display[gi][pi]
+    else:
+        for gi, pat in enumerate(q._compiled):
+            if pat is None or pat.search(text_key) is None:
+                continue
+            hits[gi] = True
+            # Anzeige wie beim Automaten: erste passende Phrase in Rubrik-Reihenfolge
+            keys = q._rubric_keys[gi]
+            pi = next(i for i, k in enumerate(keys) if k and k in text_key)
+            matched[gi] = q.rubric_display[gi][pi]
 
     return sum(hits), hits, matched
 
 def word_count(norm_text: str) -> int:
-    return 0 if not norm_text else len(norm_text.split())
+    # normalize() lässt genau ein Leerzeichen zwischen Wörtern (und keins am Rand)
+    return 0 if not norm_text else norm_text.count(" ") + 1
 
 def compute_score(q: TextQuestion, user_text: str) -> Dict[str, Any]:
     norm = normalize(user_text)
     wc = word_count(norm)
 
-    hit_count, hits, matched = rubric_hits_details(q.rubric, norm)
+    if wc == 0:
+        # leere Antwort: kein Scan nötig, kann nichts treffen
+        n = len(q.rubric)
+        hit_count, hits, matched = 0, [False] * n, [None] * n
+    else:
+        hit_count, hits, matched = q._scan(norm)
+        hits, matched = list(hits), list(matched)  # Cache-Einträge nicht teilen
     total = max(len(q.rubric), 1)
     coverage = hit_count / total
 
@@ -204,48 +282,121 @@ def ensure_decks_dir() -> Path:
 def list_decks(decks_dir: Path) -> List[Path]:
     return sorted([p for p in decks_dir.glob("*.json") if p.is_file()], key=lambda x: x.name.lower())
 
+@lru_cache(maxsize=256)
 def pretty_deck_name(filename: str) -> str:
     stem = Path(filename).stem
     stem = re.sub(r"[_-]+", " ", stem)       # Trenner -> Space
     stem = re.sub(r"\s+", " ", stem).strip() # Mehrfachspaces
     return stem
 
-def load_deck(deck_path: str) -> Tuple[DeckMeta, List[TextQuestion]]:
+def _read_deck_json(deck_path: str) -> Any:
     if not os.path.exists(deck_path):
         raise FileNotFoundError(f"Deck file not found: {deck_path}")
 
-    with open(deck_path, "r", encoding="utf-8") as f:
-        raw = json.load(f)
+    # Bytes direkt parsen (orjson, falls installiert) – spart den Text-Decode
+    with open(deck_path, "rb") as f:
+        return _json_loads(f.read())
 
+def _parse_meta(raw: Any) -> DeckMeta:
     meta = DeckMeta()
-    items = None
-
-    # Neues Format: {"meta": {...}, "questions": [...]}
-    if isinstance(raw, dict):
-        meta_obj = raw.get("meta", {})
-        if isinstance(meta_obj, dict):
-            title = meta_obj.get("title")
-            if isinstance(title, str) and title.strip():
-                meta.title = title.strip()
-
-            due = meta_obj.get("due_date")
-            if isinstance(due, str) and due.strip():
-                try:
-                    y, m, d = due.strip().split("-")
-                    meta.due_date = date(int(y), int(m), int(d))
-                except Exception:
-                    raise ValueError(f"Invalid meta.due_date (expected YYYY-MM-DD): {due}")
-
-        items = raw.get("questions")
-        if not isinstance(items, list):
-            raise ValueError("Deck JSON: 'questions' must be a list.")
-
-    # Altes Format: [...]
-    elif isinstance(raw, list):
-        items = raw
+    if not isinstance(raw, dict):
+        return meta  # Altes Format: [...] hat keine Meta-Daten
+
+    meta_obj = raw.get("meta", {})
+    if isinstance(meta_obj, dict):
+        title = meta_obj.get("title")
+        if isinstance(title, str) and title.strip():
+            meta.title = title.strip()
+
+        due = meta_obj.get("due_date")
+        if isinstance(due, str) and due.strip():
+            try:
+                y, m, d = due.strip().split("-")
+                meta.due_date = date(int(y), int(m), int(d))
+            except Exception:
+                raise ValueError(f"Invalid meta.due_date (expected YYYY-MM-DD): {due}")
+
+    return meta
+
+def _should_stream(deck_path: str) -> bool:
+    if ijson is None:
+        return False
+    if not os.path.exists(deck_path):
+        raise FileNotFoundError(f"Deck file not found: {deck_path}")
+    return os.path.getsize(deck_path) >= STREAM_MIN_BYTES
+
+def _stream_top_level(deck_path: str) -> Optional[str]:
+    with open(deck_path, "rb") as f:
+        for _prefix, event, _value in ijson.parse(f):
+            return event
+    return None
+
+def _stream_meta(deck_path: str) -> DeckMeta:
+    if _stream_top_level(deck_path) != "start_map":
+        return DeckMeta()
+    with open(deck_path, "rb") as f:
+        # bricht ab, sobald "meta" gelesen ist (steht i.d.R. vorne)
+        meta_obj = next(ijson.items(f, "meta", use_float=True), {})
+    return _parse_meta({"meta": meta_obj})
+
+def _stream_is_array(deck_path: str, prefix: str) -> bool:
+    # erstes Event zum Prefix verrät den Typ; bricht dort ab
+    with open(deck_path, "rb") as f:
+        for p, event, _value in ijson.parse(f):
+            if p == prefix:
+                return event == "start_array"
+    return False
+
+def _stream_items(deck_path: str, prefix: str) -> Iterator[Any]:
+    with open(deck_path, "rb") as f:
+        yield from ijson.items(f, prefix, use_float=True)
 
+def load_deck_meta(deck_path: str) -> Tuple[DeckMeta, Any]:
+    """
+    Nur die Meta-Daten (für den Deck-Picker): keine Fragen-Validierung,
+    keine Rubrik-Automaten. Gibt zusätzlich das geparste JSON zurück, damit
+    load_deck(..., raw=...) die Datei nicht nochmal lesen muss
+    (None bei gestreamten Decks).
+    """
+    if _should_stream(deck_path):
+        return _stream_meta(deck_path), None
+    raw = _read_deck_json(deck_path)
+    return _parse_meta(raw), raw
+
+def load_deck(deck_path: str, raw: Any = None) -> Tuple[DeckMeta, List[TextQuestion]]:
+    items: Iterable[Any]
+
+    if raw is None and _should_stream(deck_path):
+        # große Decks: Fragen einzeln aus dem Stream, ohne das ganze Dokument
+        top = _stream_top_level(deck_path)
+        if top == "start_map":
+            meta = _stream_meta(deck_path)
+            # wie beim Parsen am Stück: fehlendes/falsches "questions" ist ein Fehler
+            if not _stream_is_array(deck_path, "questions"):
+                raise ValueError("Deck JSON: 'questions' must be a list.")
+            items = _stream_items(deck_path, "questions.item")
+        elif top == "start_array":
+            meta = DeckMeta()
+            items = _stream_items(deck_path, "item")
+        else:
+            raise ValueError("Deck JSON must be a list OR an object with {meta, questions}.")
     else:
-        raise ValueError("Deck JSON must be a list OR an object with {meta, questions}.")
+        if raw is None:
+            raw = _read_deck_json(deck_path)
+        meta = _parse_meta(raw)
+
+        # Neues Format: {"meta": {...}, "questions": [...]}
+        if isinstance(raw, dict):
+            items = raw.get("questions")
+            if not isinstance(items, list):
+                raise ValueError("Deck JSON: 'questions' must be a list.")
+
+        # Altes Format: [...]
+        elif isinstance(raw, list):
+            items = raw
+
+        else:
+            raise ValueError("Deck JSON must be a list OR an object with {meta, questions}.")
 
     questions: List[TextQuestion] = []
     for i, obj in enumerate(items):
@@ -260,14 +411,22 @@ def load_deck(deck_path: str) -> Tuple[DeckMeta, List[TextQuestion]]:
 
         if not isinstance(prompt, str) or not prompt.strip():
             raise ValueError(f"Question '{qid}' missing/invalid 'prompt'.")
-        if not isinstance(rubric, list) or not all(isinstance(g, list) and all(isinstance(p, str) for p in g) for g in rubric):
+        if not isinstance(rubric, list) or not all(isinstance(g, list) for g in rubric):
             raise ValueError(f"Question '{qid}' missing/invalid 'rubric'.")
+        # Phrasen-Typen prüft normalize() gleich mit (kein zweiter Durchlauf):
+        # Nicht-Strings scheitern an .lower() bzw. am lru_cache-Hash
+        try:
+            norm_rubric = [[normalize(p) for p in group] for group in rubric]
+        except (AttributeError, TypeError):
+            raise ValueError(f"Question '{qid}' missing/invalid 'rubric'.") from None
 
         questions.append(
             TextQuestion(
                 id=qid,
                 prompt=prompt.strip(),
-                rubric=rubric,
+                rubric=norm_rubric,
+                rubric_display=rubric,
+                rubric_labels=[group[0] if group else f"Gruppe {gi+1}" for gi, group in enumerate(rubric)],
                 pass_ratio=float(obj.get("pass_ratio", 0.7)),
                 min_words=int(obj.get("min_words", 20)),
                 max_repeats=int(obj.get("max_repeats", 999999)),
@@ -278,6 +437,13 @@ def load_deck(deck_path: str) -> Tuple[DeckMeta, List[TextQuestion]]:
     if not questions:
         raise ValueError("No 'text' questions found in deck.")
 
+    for q in questions:
+        compile_rubric(q)
+        q._feedback = [(f"Wort verwendet: {label}  (matched: '", f"Es Fehlt: {label}") for label in q.rubric_labels]
+
+    # Rubrik-Phrasen sind jetzt fest normalisiert; Cache für Antworttexte freihalten
+    normalize.cache_clear()
+
     return meta, questions
 
 def data_dir_path() -> Path:
@@ -293,13 +459,33 @@ def load_progress() -> dict:
     if not p.exists():
         return {"version": 1, "decks": {}}
     try:
-        return json.loads(p.read_text(encoding="utf-8"))
+        return _json_loads(p.read_bytes())
     except Exception:
         return {"version": 1, "decks": {}}
 
 def save_progress(db: dict) -> None:
     p = progress_file_path()
-    p.write_text(json.dumps(db, ensure_ascii=False, indent=2), encoding="utf-8")
+    # kompakt schreiben und atomar ersetzen (kein halb geschriebenes progress.json)
+    tmp = p.with_name(p.name + ".tmp")
+    tmp.write_bytes(_json_dumps(db))
+    os.replace(tmp, p)
+
+def load_deck_titles() -> Dict[str, Any]:
+    """Titel-Cache des Deck-Pickers: deck_key -> {"mtime", "size", "title"}."""
+    p = data_dir_path() / DECK_TITLES_FILE
+    if not p.exists():
+        return {}
+    try:
+        cache = _json_loads(p.read_bytes())
+        return cache if isinstance(cache, dict) else {}
+    except Exception:
+        return {}
+
+def save_deck_titles(cache: Dict[str, Any]) -> None:
+    p = data_dir_path() / DECK_TITLES_FILE
+    tmp = p.with_name(p.name + ".tmp")
+    tmp.write_bytes(_json_dumps(cache))
+    os.replace(tmp, p)
 
 def deck_key(deck_path: Path) -> str:
     # stabiler Key (relativ zum project root)
@@ -336,6 +522,47 @@ def set_daily_pack(db: dict, qids: List[str]) -> None:
     db["daily_pack"] = {"date": today_iso(), "qids": list(qids)}
     save_progress(db)
 
+# ----------------------------
+# Fonts / Farben (statt per-Widget Stylesheets)
+# ----------------------------
+
+def pixel_font(px: int) -> QFont:
+    f = QFont()
+    f.setPixelSize(px)
+    return f
+
+def text_palette(base: QPalette, color: str) -> QPalette:
+    pal = QPalette(base)
+    pal.setColor(QPalette.ColorRole.WindowText, QColor(color))
+    return pal
+
+# ----------------------------
+# Deck Loading im Hintergrund
+# ----------------------------
+
+class _DeckLoadSignals(QObject):
+    done = Signal(object)   # List[Tuple[Path, DeckMeta, List[TextQuestion]]]
+    failed = Signal(str)
+
+class DeckLoadWorker(QRunnable):
+    """
+    Parst die gewählten Decks (JSON + Rubrik-Automaten) im Thread-Pool,
+    damit das Hauptfenster sofort zeichnet statt einzufrieren.
+    """
+    def __init__(self, deck_paths: List[Path], raw_by_path: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self.deck_paths = deck_paths
+        self.raw_by_path = raw_by_path or {}
+        self.signals = _DeckLoadSignals()
+
+    def run(self):
+        try:
+            loaded = [(dp, *load_deck(str(dp), raw=self.raw_by_path.get(str(dp)))) for dp in self.deck_paths]
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.done.emit(loaded)
+
 # ----------------------------
 # Deck Picker Dialog
 # ----------------------------
@@ -347,6 +574,8 @@ class DeckPickerDialog(QDialog):
         self.resize(520, 420)
 
         self._decks = decks
+        # vom Picker schon geparstes JSON, pro Pfad; ausgewählte gehen ans Hauptfenster
+        self._raw: Dict[str, Any] = {}
 
         layout = QVBoxLayout(self)
 
@@ -362,15 +591,29 @@ class DeckPickerDialog(QDialog):
         layout.addWidget(self.adhd_box)
 
         self.list = QListWidget()
-        self.list.setStyleSheet("font-size: 13px;")
+        self.list.setFont(pixel_font(13))
         layout.addWidget(self.list)
 
+        # Titel nur für neue/geänderte Decks aus der Datei lesen
+        title_cache = load_deck_titles()
+        titles: Dict[str, Any] = {}
+
         for p in decks:
             label = pretty_deck_name(p.name)
             try:
-                m, _qs = load_deck(str(p))
-                if m.title:
-                    label = m.title
+                key = deck_key(p)
+                st = p.stat()
+                hit = title_cache.get(key)
+                if isinstance(hit, dict) and hit.get("mtime") == st.st_mtime and hit.get("size") == st.st_size:
+                    title = str(hit.get("title") or "")
+                else:
+                    m, raw = load_deck_meta(str(p))
+                    if raw is not None:
+                        self._raw[str(p)] = raw
+                    title = m.title or ""
+                titles[key] = {"mtime": st.st_mtime, "size": st.st_size, "title": title}
+                if title:
+                    label = title
             except Exception:
                 pass
 
@@ -380,7 +623,14 @@ class DeckPickerDialog(QDialog):
             item.setCheckState(Qt.CheckState.Unchecked)
             self.list.addItem(item)
 
+        if titles != title_cache:
+            try:
+                save_deck_titles(titles)
+            except Exception:
+                pass
+
         self.selected_paths: List[Path] = []
+        self.selected_raw: Dict[str, Any] = {}
 
         if self.list.count() > 0:
             self.list.setCurrentRow(0)
@@ -399,6 +649,8 @@ class DeckPickerDialog(QDialog):
         if not selected:
             return
         self.selected_paths = selected
+        self.selected_raw = {str(p): self._raw[str(p)] for p in selected if str(p) in self._raw}
+        self._raw = {}
         self.adhd_mode = bool(self.adhd_box.isChecked())
         self.accept()
 
@@ -427,78 +679,151 @@ class SubmitTextEdit(QTextEdit):
 # ----------------------------
 
 class LumioMainWindow(QMainWindow):
-    def __init__(self, deck_paths: List[Path], adhd_mode: bool = False):
+    def __init__(self, deck_paths: List[Path], adhd_mode: bool = False,
+                 deck_raw: Optional[Dict[str, Any]] = None):
         super().__init__()
 
         self.setWindowTitle(APP_NAME)
         self.resize(980, 680)
 
         self.deck_paths = deck_paths
+        self._deck_raw = deck_raw
 
         self.adhd_mode = adhd_mode
         self.focus_lock = FocusLockManager(self, enabled=self.adhd_mode, reactivate_minutes=5)
 
-        # progress
+        # progress (Schreiben gebündelt, siehe _mark_progress_dirty)
         self.progress_db = load_progress()
+        self._progress_dirty = False
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(2000)
+        self._flush_timer.timeout.connect(self._flush_progress)
 
         # multi-deck store
-        self.decks: Dict[str, Dict[str, Any]] = {}          # dk -> {path, meta, questions}
-        self.all_questions: Dict[str, TextQuestion] = {}    # gqid -> TextQuestion
-        self.global_to_deck: Dict[str, str] = {}            # gqid -> dk
+        self.decks: Dict[str, Dict[str, Any]] = {}          # dk -> {path, meta, questions, idx}
+        # Fragen liegen zusammenhängend in einer Liste; der ganze Session-State
+        # ist über den Listenindex adressiert (int statt "dk::qid"-Strings)
+        self.questions: List[TextQuestion] = []
+        self._idx_of: Dict[str, int] = {}                   # gqid -> idx
+
+        # state (wird gefüllt, sobald die Decks geladen sind)
+        self.mastered: set[int] = set()
+        self.attempts: List[int] = []
+        self.fail_counts: List[int] = []
+        self.points: List[int] = []
+        self._open_by_deck: Dict[str, set[int]] = {}
+        self.queue: deque[int] = deque()
+        self.today_set: set[int] = set()
+
+        self.current_idx: Optional[int] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+
+        # UI sofort zeigen, Decks im Hintergrund laden
+        self._build_ui()
+        self._start_deck_load()
 
-        for dp in self.deck_paths:
+    def _start_deck_load(self):
+        self.question_label.setText("Lade Decks …")
+        self.text.setDisabled(True)
+        self.check_btn.setDisabled(True)
+        self.reset_btn.setDisabled(True)
+        self.progress.setRange(0, 0)  # busy indicator
+
+        self._deck_loader = DeckLoadWorker(self.deck_paths, self._deck_raw)
+        self._deck_raw = None
+        self._deck_loader.signals.done.connect(self._on_decks_loaded)
+        self._deck_loader.signals.failed.connect(self._on_deck_load_failed)
+        QThreadPool.globalInstance().start(self._deck_loader)
+
+    def _on_deck_load_failed(self, msg: str):
+        QMessageBox.critical(self, APP_NAME, f"Fehler beim Laden der Decks:\n{msg}")
+        self.close()
+
+    def _on_decks_loaded(self, loaded: List[Tuple[Path, DeckMeta, List[TextQuestion]]]):
+        self._deck_loader = None
+        # läuft als Slot, nicht mehr im try/except von main(): kaputtes progress.json,
+        # Schreibfehler beim Tagespaket usw. hier abfangen
+        try:
+            self._apply_loaded_decks(loaded)
+        except Exception as e:
+            self._on_deck_load_failed(str(e))
+
+    def _apply_loaded_decks(self, loaded: List[Tuple[Path, DeckMeta, List[TextQuestion]]]):
+        for dp, meta, questions in loaded:
             dk = deck_key(dp)
-            meta, questions = load_deck(str(dp))
-            self.decks[dk] = {"path": dp, "meta": meta, "questions": questions}
+            # doppelte IDs im Deck: eine Frage pro gqid, die letzte gewinnt (Position der ersten)
+            by_id: Dict[str, TextQuestion] = {}
+            for q in questions:
+                by_id[q.id] = q
+            questions = list(by_id.values())
+            start = len(self.questions)
+            self.decks[dk] = {"path": dp, "meta": meta, "questions": questions,
+                              "idx": range(start, start + len(questions))}
 
             for q in questions:
-                gqid = f"{dk}::{q.id}"
-                self.all_questions[gqid] = q
-                self.global_to_deck[gqid] = dk
+                q.dk = dk
+                q.gqid = f"{dk}::{q.id}"
+                self._idx_of[q.gqid] = len(self.questions)
+                self.questions.append(q)
 
-        # state
-        self.mastered: set[str] = set()
-        self.attempts: Dict[str, int] = {}
-        self.fail_counts: Dict[str, int] = {}
-        self.points: Dict[str, int] = {}
+        # state (Defaults in einem Rutsch, danach nur gespeicherte Einträge überschreiben)
+        n = len(self.questions)
+        self.attempts = [0] * n
+        self.fail_counts = [0] * n
+        self.points = [-1] * n
 
         # load persisted state
-        for gqid, q in self.all_questions.items():
-            dk = self.global_to_deck[gqid]
-            qid = q.id
-            deck_entry = self.progress_db.get("decks", {}).get(dk, {})
-            q_entry = deck_entry.get("questions", {}).get(qid, {})
-
-            if bool(q_entry.get("mastered", False)):
-                self.mastered.add(gqid)
-
-            self.attempts[gqid] = int(q_entry.get("attempts", 0))
-            self.fail_counts[gqid] = int(q_entry.get("fails", 0))
-            self.points[gqid] = int(q_entry.get("points", -1))
+        saved_decks = self.progress_db.get("decks", {})
+        for dk in self.decks:
+            saved_questions = saved_decks.get(dk, {}).get("questions", {})
+            for qid, q_entry in saved_questions.items():
+                idx = self._idx_of.get(f"{dk}::{qid}")
+                if idx is None:
+                    continue
+
+                if bool(q_entry.get("mastered", False)):
+                    self.mastered.add(idx)
+
+                self.attempts[idx] = int(q_entry.get("attempts", 0))
+                self.fail_counts[idx] = int(q_entry.get("fails", 0))
+                self.points[idx] = int(q_entry.get("points", -1))
+
+        # offene (nicht mastered) Fragen je Deck, wird in on_check mitgepflegt
+        self._open_by_deck = {
+            dk: set(d["idx"]).difference(self.mastered) for dk, d in self.decks.items()
+        }
 
         # today's pack
         saved = get_daily_pack(self.progress_db)
         if saved:
             # Nur offene Fragen behalten (falls seitdem etwas mastered wurde)
-            self.queue = [gqid for gqid in saved if gqid in self.all_questions and gqid not in self.mastered]
+            saved_idx = (self._idx_of.get(gqid) for gqid in saved)
+            self.queue = deque(i for i in saved_idx if i is not None and i not in self.mastered)
         else:
-            self.queue = self._build_daily_queue()
-            random.shuffle(self.queue)
-            set_daily_pack(self.progress_db, self.queue)
+            self.queue = self._new_daily_queue()
+            set_daily_pack(self.progress_db, [self.questions[i].gqid for i in self.queue])
 
         self.today_set = set(self.queue)
 
-
-        self.current_id: Optional[str] = None
-        self.last_result: Optional[Dict[str, Any]] = None
-
-        self._build_ui()
+        self.progress.setRange(0, max(len(self.today_set), 1))
+        self.reset_btn.setEnabled(True)
         self._load_current()
 
         if self.adhd_mode and len(self.today_set) > 0:
-            from PySide6.QtCore import QTimer
             QTimer.singleShot(0, self.focus_lock.enable_lock)
 
+    @contextmanager
+    def _updates_paused(self):
+        # mehrere setText/setEnabled -> ein einziger Repaint am Ende
+        root = self.centralWidget()
+        root.setUpdatesEnabled(False)
+        try:
+            yield
+        finally:
+            root.setUpdatesEnabled(True)
+            root.update()
+
     def on_submit(self):
         # Enter: wenn Next enabled -> Next, sonst -> Check
         if self.next_btn.isEnabled():
@@ -514,22 +839,29 @@ class LumioMainWindow(QMainWindow):
         layout.setContentsMargins(18, 18, 18, 18)
         layout.setSpacing(12)
 
+        # einmal bauen, an alle Labels verteilen (kein QSS-Parsing pro Widget)
+        small = pixel_font(13)
+        muted_pal = text_palette(self.palette(), "#AAA")
+        light_pal = text_palette(self.palette(), "#CCC")
+
         top = QHBoxLayout()
         self.deck_label = QLabel(f"Decks: {len(self.deck_paths)} ausgewählt")
-        self.deck_label.setStyleSheet("font-size: 13px; color: #AAA;")
+        self.deck_label.setFont(small)
+        self.deck_label.setPalette(muted_pal)
         top.addWidget(self.deck_label)
 
         top.addStretch(1)
 
         self.progress_text = QLabel("")
-        self.progress_text.setStyleSheet("font-size: 13px; color: #AAA;")
+        self.progress_text.setFont(small)
+        self.progress_text.setPalette(muted_pal)
         top.addWidget(self.progress_text)
 
         layout.addLayout(top)
 
         self.progress = QProgressBar()
         self.progress.setTextVisible(True)
-        self.progress.setFormat("%v / %m bestanden")
+        self.progress.setFormat("%v / %m heute bestanden")
         self.progress.setMinimum(0)
         self.progress.setMaximum(max(len(self.today_set), 1))
         self.progress.setValue(0)
@@ -548,7 +880,7 @@ class LumioMainWindow(QMainWindow):
         f.setPointSize(16)
         f.setBold(True)
         self.question_label.setFont(f)
-        self.question_label.setStyleSheet("color: #333;")
+        self.question_label.setPalette(text_palette(self.question_label.palette(), "#333"))
         qbox_layout.addWidget(self.question_label)
 
         layout.addWidget(qbox)
@@ -557,7 +889,7 @@ class LumioMainWindow(QMainWindow):
         self.text = SubmitTextEdit(self.on_submit)
         self.text.setPlaceholderText("Antwort eingeben …")
         self.text.setFixedHeight(150)
-        self.text.setStyleSheet("font-size: 13px;")
+        self.text.setFont(small)
         layout.addWidget(self.text)
 
         # Buttons
@@ -584,13 +916,15 @@ class LumioMainWindow(QMainWindow):
         self.feedback_left = QLabel("")
         self.feedback_left.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
         self.feedback_left.setWordWrap(True)
-        self.feedback_left.setStyleSheet("font-size: 13px; color: #CCC;")
+        self.feedback_left.setFont(small)
+        self.feedback_left.setPalette(light_pal)
         self.feedback_left.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
 
         self.feedback_right = QLabel("")
         self.feedback_right.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
         self.feedback_right.setWordWrap(True)
-        self.feedback_right.setStyleSheet("font-size: 13px; color: #ccc;")
+        self.feedback_right.setFont(small)
+        self.feedback_right.setPalette(light_pal)
         self.feedback_right.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
 
         fb_row.addWidget(self.feedback_left, 1)
@@ -601,7 +935,8 @@ class LumioMainWindow(QMainWindow):
         self.solution_view = QLabel("")
         self.solution_view.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
         self.solution_view.setWordWrap(True)
-        self.solution_view.setStyleSheet("font-size: 13px; color: #ccc;")
+        self.solution_view.setFont(small)
+        self.solution_view.setPalette(light_pal)
         self.solution_view.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
         layout.addWidget(self.solution_view)
 
@@ -609,49 +944,54 @@ class LumioMainWindow(QMainWindow):
         self.check_btn.setShortcut("Ctrl+Return")
         self.next_btn.setShortcut("Ctrl+N")
 
-    def _build_daily_queue(self) -> List[str]:
-        qids: List[str] = []
+    def _build_daily_queue(self) -> List[int]:
+        qids: List[int] = []
+        report: List[Tuple[str, int, Optional[date], int]] = []
 
         for dk, d in self.decks.items():
             meta: DeckMeta = d["meta"]
-            qs: List[TextQuestion] = d["questions"]
 
             # offene Fragen in diesem Deck
-            candidates = [f"{dk}::{q.id}" for q in qs if f"{dk}::{q.id}" not in self.mastered]
+            candidates = list(self._open_by_deck[dk])
             remaining = len(candidates)
 
             quota = deck_daily_quota(meta.due_date, remaining)
+            report.append((dk, remaining, meta.due_date, quota))
             if quota <= 0:
                 continue
 
-            random.shuffle(candidates)
-            qids.extend(candidates[:quota])
+            # O(quota) statt die ganze Kandidatenliste zu mischen
+            qids.extend(random.sample(candidates, min(quota, remaining)))
 
+        # einmal über alle Decks mischen
         random.shuffle(qids)
 
         print("---- DAILY QUOTAS ----")
-        for dk, d in self.decks.items():
-            meta = d["meta"]
-            qs = d["questions"]
-            candidates = [f"{dk}::{q.id}" for q in qs if f"{dk}::{q.id}" not in self.mastered]
-            remaining = len(candidates)
-            quota = deck_daily_quota(meta.due_date, remaining)
-            print(dk, "remaining=", remaining, "due=", meta.due_date, "quota=", quota)
+        for dk, remaining, due, quota in report:
+            print(dk, "remaining=", remaining, "due=", due, "quota=", quota)
         print("----------------------")
 
         return qids
 
+    def _new_daily_queue(self) -> deque[int]:
+        # _build_daily_queue liefert bereits gemischt; Queue ist eine deque (O(1) popleft)
+        return deque(self._build_daily_queue())
+
+    def _reroll_today_pack(self):
+        self.queue = self._new_daily_queue()
+        self.today_set = set(self.queue)
+        self.progress.setMaximum(max(len(self.today_set), 1))
+
     def _update_progress(self):
         # Tagesziel = len(queue)+mastered_today? -> Wir definieren: today's pack = self.today_set
         today_total = len(self.today_set)
-        today_done = sum(1 for gqid in self.today_set if gqid in self.mastered)
+        today_done = sum(1 for i in self.today_set if i in self.mastered)
 
-        overall_total = len(self.all_questions)
+        overall_total = len(self.questions)
         overall_done = len(self.mastered)
 
-        self.progress.setMaximum(today_total if today_total > 0 else 1)
+        # Maximum ändert sich nur mit dem Tagespaket (siehe _reroll_today_pack)
         self.progress.setValue(today_done)
-        self.progress.setFormat("%v / %m heute bestanden")
 
         self.progress_text.setText(
             f"Heute: {today_done}/{today_total} | Gesamt: {overall_done}/{overall_total}"
@@ -660,8 +1000,8 @@ class LumioMainWindow(QMainWindow):
     def _load_current(self):
         self._update_progress()
 
-        if len(self.mastered) == len(self.all_questions):
-            self.current_id = None
+        if len(self.mastered) == len(self.questions):
+            self.current_idx = None
             self.question_label.setText("Fertig. Alle Fragen bestanden.")
             self.text.setDisabled(True)
             self.check_btn.setDisabled(True)
@@ -671,37 +1011,36 @@ class LumioMainWindow(QMainWindow):
             self.solution_view.setText("")
             return
 
-        while self.queue and (self.queue[0] in self.mastered):
-            self.queue.pop(0)
-
+        # Invariante: die Queue enthält nie mastered IDs (gespeichertes Paket und
+        # _build_daily_queue filtern, on_check hängt nur nicht bestandene wieder an)
         if not self.queue:
             # Tagespaket leer -> neu bauen
-            self.queue = self._build_daily_queue()
-            self.today_set = set(self.queue)
-            random.shuffle(self.queue)
+            self._reroll_today_pack()
 
             if not self.queue:
-                self.current_id = None
+                self.current_idx = None
                 self.question_label.setText("Keine offenen Fragen im Tagespaket.")
                 return
 
-        self.current_id = self.queue[0]
-        q = self.all_questions[self.current_id]
-        dk = self.global_to_deck[self.current_id]
+        self.current_idx = self.queue[0]
+        q = self.questions[self.current_idx]
+        dk = q.dk
         meta = self.decks[dk]["meta"]
         title = meta.title or pretty_deck_name(self.decks[dk]["path"].name)
-        self.deck_label.setText(f"Aktuelles Deck: {title}")
-        self.question_label.setText(q.prompt)
-        self.text.clear()
         self.last_result = None
 
-        self.feedback_left.setText("")
-        self.feedback_right.setText("")
-        self.solution_view.setText("")
+        with self._updates_paused():
+            self.deck_label.setText(f"Aktuelles Deck: {title}")
+            self.question_label.setText(q.prompt)
+            self.text.clear()
 
-        self.text.setDisabled(False)
-        self.check_btn.setEnabled(True)
-        self.next_btn.setEnabled(False)
+            self.feedback_left.setText("")
+            self.feedback_right.setText("")
+            self.solution_view.setText("")
+
+            self.text.setDisabled(False)
+            self.check_btn.setEnabled(True)
+            self.next_btn.setEnabled(False)
         self.text.setFocus()
 
     def _format_feedback(self, q: TextQuestion, result: Dict[str, Any], points: Optional[int] = None) -> Tuple[str, str]:
@@ -717,61 +1056,56 @@ class LumioMainWindow(QMainWindow):
         left_lines = [status, score_line, length_line, hits_line]
         if points_line:
             left_lines.append(points_line)
-        left = "\n".join(left_lines).strip()
-
-        hits = result.get("hits", [])
-        matched = result.get("matched", [])
-        rubric_lines = []
-        for i, group in enumerate(q.rubric):
-            ok = hits[i] if i < len(hits) else False
-            m = matched[i] if i < len(matched) else None
-            label = group[0] if group else f"Gruppe {i+1}"
-            if ok:
-                rubric_lines.append(f"Wort verwendet: {label}  (matched: '{m}')")
-            else:
-                rubric_lines.append(f"Es Fehlt: {label}")
+        left = "\n".join(left_lines)
+
+        # Zeilen sind zur Ladezeit vorberechnet (load_deck -> q._feedback)
+        rubric_lines = [
+            hit + m + "')" if ok else miss
+            for (hit, miss), ok, m in zip(q._feedback, result["hits"], result["matched"])
+        ]
 
         right = "Rubrik-Details:\n" + "\n".join(rubric_lines)
         return left, right
 
     def on_check(self):
-        if not self.current_id:
+        idx = self.current_idx
+        if idx is None:
             return
 
-        q = self.all_questions[self.current_id]
+        q = self.questions[idx]
         user_text = self.text.toPlainText()
 
-        self.attempts[self.current_id] = self.attempts.get(self.current_id, 0) + 1
+        self.attempts[idx] += 1
         result = compute_score(q, user_text)
         self.last_result = result
 
         pts = int(round(result["effective"] * 100))
-        self.points[self.current_id] = pts
-
-        left, right = self._format_feedback(q, result, points=pts)
-        self.feedback_left.setText(left)
-        self.feedback_right.setText(right)
+        self.points[idx] = pts
 
         if result["passed"]:
-            self.mastered.add(self.current_id)
-            if self.queue and self.queue[0] == self.current_id:
-                self.queue.pop(0)
+            self.mastered.add(idx)
+            self._open_by_deck[q.dk].discard(idx)
+            if self.queue and self.queue[0] == idx:
+                self.queue.popleft()
         else:
-            self.fail_counts[self.current_id] = self.fail_counts.get(self.current_id, 0) + 1
-            if self.queue and self.queue[0] == self.current_id:
-                self.queue.pop(0)
-            self.queue.append(self.current_id)  # Wiederholung am selben Tag erzwingen
-
+            self.fail_counts[idx] += 1
+            if self.queue and self.queue[0] == idx:
+                self.queue.popleft()
+            self.queue.append(idx)  # Wiederholung am selben Tag erzwingen
 
+        self._persist_question_state(idx)
 
-        self._persist_question_state(self.current_id)
-        self._update_progress()
+        left, right = self._format_feedback(q, result, points=pts)
+        sol = q.example or "(keine Beispielantwort hinterlegt)"  # in load_deck bereits gestrippt
 
-        sol = q.example.strip() if q.example else "(keine Beispielantwort hinterlegt)"
-        self.solution_view.setText("LÖSUNG:\n" + sol)
+        with self._updates_paused():
+            self.feedback_left.setText(left)
+            self.feedback_right.setText(right)
+            self._update_progress()
+            self.solution_view.setText("LÖSUNG:\n" + sol)
 
-        self.check_btn.setDisabled(True)
-        self.next_btn.setEnabled(True)
+            self.check_btn.setDisabled(True)
+            self.next_btn.setEnabled(True)
 
         if self._today_completed():
             # Fokus aus, normales Fenster
@@ -780,9 +1114,9 @@ class LumioMainWindow(QMainWindow):
     def on_next(self):
         self._load_current()
 
-    def _persist_question_state(self, gqid: str) -> None:
-        q = self.all_questions[gqid]
-        dk = self.global_to_deck[gqid]
+    def _persist_question_state(self, idx: int) -> None:
+        q = self.questions[idx]
+        dk = q.dk
         qid = q.id
 
         decks = self.progress_db.setdefault("decks", {})
@@ -790,12 +1124,24 @@ class LumioMainWindow(QMainWindow):
         qs = d.setdefault("questions", {})
 
         qs[qid] = {
-            "mastered": (gqid in self.mastered),
-            "attempts": int(self.attempts.get(gqid, 0)),
-            "fails": int(self.fail_counts.get(gqid, 0)),
-            "points": int(self.points.get(gqid, -1)),
+            "mastered": (idx in self.mastered),
+            "attempts": self.attempts[idx],
+            "fails": self.fail_counts[idx],
+            "points": self.points[idx],
             "updated_at": int(__import__("time").time()),
         }
+        self._mark_progress_dirty()
+
+    def _mark_progress_dirty(self):
+        # mehrere Checks innerhalb von 2s -> ein einziger Schreibvorgang
+        self._progress_dirty = True
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _flush_progress(self):
+        if not self._progress_dirty:
+            return
+        self._progress_dirty = False
         save_progress(self.progress_db)
 
     def on_reset(self):
@@ -804,17 +1150,20 @@ class LumioMainWindow(QMainWindow):
         if resp != QMessageBox.StandardButton.Yes:
             return
 
-        self.queue = self._build_daily_queue()
-        self.today_set = set(self.queue)
-        random.shuffle(self.queue)
+        self._reroll_today_pack()
 
         self.check_btn.setEnabled(True)
         self.next_btn.setEnabled(False)
         self._load_current()
 
     def _today_completed(self) -> bool:
-        return all(gqid in self.mastered for gqid in self.today_set)
+        return all(i in self.mastered for i in self.today_set)
+
 
+    def closeEvent(self, event):
+        self._flush_timer.stop()
+        self._flush_progress()
+        super().closeEvent(event)
 
     def changeEvent(self, event):
         super().changeEvent(event)
@@ -840,7 +1189,8 @@ def main():
         return
 
     try:
-        win = LumioMainWindow(picker.selected_paths, adhd_mode=picker.adhd_mode)
+        win = LumioMainWindow(picker.selected_paths, adhd_mode=picker.adhd_mode,
+                              deck_raw=picker.selected_raw)
     except Exception as e:
         QMessageBox.critical(None, APP_NAME, f"Fehler beim Laden der Decks:\n{e}")
         return